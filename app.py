@@ -1,13 +1,19 @@
 import os
+import json
+import html
 import datetime
+import itertools
 import threading
-import concurrent.futures
-from flask import Flask, request, jsonify, render_template, send_file, Response
+import asyncio
+from collections import OrderedDict, deque
+from flask import Flask, request, jsonify, render_template, send_file, Response, stream_with_context
 import pandas as pd
+import openpyxl
 
 # Import your local scrapers
 from scraper.maps_scraper import scrape_google_maps
-from scraper.enricher import enrich_business_data
+from scraper.async_enricher import enrich_many
+from scraper.enricher import normalize_website, score_leads
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 RESULT_FOLDER = os.path.join(BASE_DIR, "results")
@@ -24,16 +30,49 @@ state = {
     "progress": 0,
     "total_progress": 0,
     "cancel": False,
-    "logs": []
+    # Keep last 100 logs to prevent memory issues (old entries drop off in O(1))
+    "logs": deque(maxlen=100)
 }
 
+# Dashboard file list as one (signature, files) tuple, swapped in a single assignment
+files_cache = (None, [])
+
+# (filename, mtime) -> preview payload, least recently used first
+PREVIEW_CACHE_SIZE = 32
+preview_cache = OrderedDict()
+preview_lock = threading.Lock()
+
 def add_log(msg):
     """Adds a timestamped log to the global state."""
     timestamp = datetime.datetime.now().strftime("%H:%M:%S")
     state["logs"].append(f"[{timestamp}] {msg}")
-    # Keep last 100 logs to prevent memory issues
-    if len(state["logs"]) > 100:
-        state["logs"].pop(0)
+
+def read_xlsx_rows(path):
+    """Yields the header row, then every data row, from a read-only workbook (constant memory)."""
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+def cell_str(value):
+    """Empty string for blank cells, str() for everything else."""
+    return "" if value is None else str(value)
+
+def unique_emails(cells):
+    """Splits comma-separated email cells and dedupes them with vectorized string ops."""
+    s = pd.Series(cells, dtype="string").str.split(",").explode().str.strip()
+    s = s[s.str.contains("@", regex=False, na=False)]
+    return s.unique().tolist()
+
+def rows_to_html(header, rows):
+    """Small HTML table for the preview modal (same classes the template styles)."""
+    head = "".join(f"<th>{html.escape(cell_str(h))}</th>" for h in header)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{html.escape(cell_str(v))}</td>" for v in row) + "</tr>"
+        for row in rows
+    )
+    return f'<table class="preview-table"><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>'
 
 # --- ROUTES ---
 
@@ -43,33 +82,46 @@ def index():
     Renders the dashboard.
     Gathers file metadata (Name, Size, Date) for the UI cards.
     """
-    files_data = []
-    # Get all xlsx files
-    raw_files = [f for f in os.listdir(RESULT_FOLDER) if f.endswith('.xlsx')]
+    return render_template("index.html", files=list_result_files())
+
+def list_result_files():
+    """
+    Returns the report cards for the dashboard, newest first.
+    One cached stat() per entry via os.scandir; the formatted list is reused
+    while every report's name, mtime and size are unchanged (so a report that
+    was still being written when first listed gets its final size next time).
+    """
+    global files_cache
+
+    entries = []
+    with os.scandir(RESULT_FOLDER) as it:
+        for e in it:
+            if not e.name.endswith('.xlsx'): continue
+            try:
+                entries.append((e.name, e.stat()))
+            except OSError:
+                pass # Skip if file access error
+
+    signature = frozenset((name, st.st_mtime_ns, st.st_size) for name, st in entries)
+    cached_signature, cached_files = files_cache
+    if cached_signature == signature:
+        return cached_files
+
     # Sort by modification time (Newest first)
-    raw_files.sort(key=lambda x: os.path.getmtime(os.path.join(RESULT_FOLDER, x)), reverse=True)
-    
-    for f in raw_files:
-        path = os.path.join(RESULT_FOLDER, f)
-        try:
-            # Calculate size in KB
-            size_kb = round(os.path.getsize(path) / 1024, 1)
-            # Format date
-            date = datetime.datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y-%m-%d %H:%M')
-            
-            files_data.append({
-                "name": f,
-                "size": f"{size_kb} KB",
-                "date": date
-            })
-        except Exception:
-            pass # Skip if file access error
-
-    return render_template("index.html", files=files_data)
+    entries.sort(key=lambda x: x[1].st_mtime, reverse=True)
+
+    files_data = [{
+        "name": name,
+        "size": f"{round(st.st_size / 1024, 1)} KB",
+        "date": datetime.datetime.fromtimestamp(st.st_mtime).strftime('%Y-%m-%d %H:%M')
+    } for name, st in entries]
+
+    files_cache = (signature, files_data)
+    return files_data
 
 @app.route("/status")
 def status():
-    return jsonify(state)
+    return jsonify({**state, "logs": list(state["logs"])})
 
 @app.route("/cancel", methods=["POST"])
 def cancel():
@@ -91,30 +143,33 @@ def download_vcf(filename):
     if not os.path.exists(path): return "File not found", 404
     
     try:
-        df = pd.read_excel(path)
-        vcf_data = ""
-        
-        for _, row in df.iterrows():
-            name = str(row.get('name', 'Unknown'))
-            phone = str(row.get('clean_phone', ''))
-            email = str(row.get('best_email', ''))
-            org = str(row.get('keyword_source', 'Lead'))
-            
-            # Skip contacts with no useful info
-            if (not phone or phone == 'nan') and (not email or email == 'nan'): 
-                continue
-            
-            vcf_data += "BEGIN:VCARD\nVERSION:3.0\n"
-            vcf_data += f"FN:{name}\n"
-            vcf_data += f"ORG:{org}\n"
-            if phone and phone != 'nan': vcf_data += f"TEL;TYPE=CELL:{phone}\n"
-            if email and email != 'nan': vcf_data += f"EMAIL:{email}\n"
-            vcf_data += "END:VCARD\n"
-
-        # Return as a downloadable file
+        rows = read_xlsx_rows(path)
+        header = next(rows, ())
+
+        def vcf_generator():
+            for values in rows:
+                row = dict(zip(header, values))
+                name = cell_str(row.get('name')) or 'Unknown'
+                phone = cell_str(row.get('clean_phone'))
+                email = cell_str(row.get('best_email'))
+                org = cell_str(row.get('keyword_source')) or 'Lead'
+                
+                # Skip contacts with no useful info
+                if not phone and not email: 
+                    continue
+                
+                # One encoded chunk per contact (vCard lines end with CRLF)
+                tel = f"TEL;TYPE=CELL:{phone}\r\n" if phone else ""
+                mail = f"EMAIL:{email}\r\n" if email else ""
+                yield (
+                    f"BEGIN:VCARD\r\nVERSION:3.0\r\nFN:{name}\r\nORG:{org}\r\n"
+                    f"{tel}{mail}END:VCARD\r\n"
+                ).encode('utf-8')
+
+        # Return as a downloadable file (streamed row by row)
         new_filename = filename.replace('.xlsx', '.vcf')
         return Response(
-            vcf_data,
+            stream_with_context(vcf_generator()),
             mimetype="text/vcard",
             headers={"Content-disposition": f"attachment; filename={new_filename}"}
         )
@@ -127,6 +182,9 @@ def delete_file(filename):
         path = os.path.join(RESULT_FOLDER, filename)
         if os.path.exists(path):
             os.remove(path)
+            # Also drop the raw JSONL the report was built from
+            jsonl_path = os.path.splitext(path)[0] + ".jsonl"
+            if os.path.exists(jsonl_path): os.remove(jsonl_path)
             return jsonify({"status": "success"})
         else:
             return jsonify({"error": "File does not exist"})
@@ -140,37 +198,58 @@ def preview_file(filename):
         if not os.path.exists(path): 
             return jsonify({"error": "File not found"})
         
-        df = pd.read_excel(path)
-        
-        # 1. Stats
-        total_leads = int(len(df))
-        
-        # 2. Extract ALL Valid Emails for the Copy Button
-        email_list = []
-        if 'emails' in df.columns:
-            # Get all non-empty email cells
-            raw_emails = df['emails'].dropna().astype(str).tolist()
-            for row in raw_emails:
-                if '@' in row:
-                    parts = [e.strip() for e in row.split(',') if '@' in e]
-                    email_list.extend(parts)
-        
-        # Remove duplicates
-        email_list = list(set(email_list))
-        
-        # 3. Generate Table
-        preview_html = df.head(5).to_html(classes='preview-table', index=False, border=0)
-        
-        return jsonify({
-            "status": "success",
-            "total_leads": total_leads,
-            "total_emails": len(email_list),
-            "email_list": email_list,
-            "html": preview_html
-        })
+        return jsonify(get_preview(filename, path))
     except Exception as e:
         return jsonify({"error": f"Could not read file: {str(e)}"})
 
+def get_preview(filename, path):
+    """
+    Returns the preview payload for a report, parsing it at most once per
+    (filename, mtime) so repeat previews of an unchanged file are instant.
+    """
+    key = (filename, os.path.getmtime(path))
+    with preview_lock:
+        if key in preview_cache:
+            preview_cache.move_to_end(key)
+            return preview_cache[key]
+
+    # Parse outside the lock so one slow file doesn't hold up other previews
+    payload = build_preview(path)
+    with preview_lock:
+        preview_cache[key] = payload
+        if len(preview_cache) > PREVIEW_CACHE_SIZE:
+            preview_cache.popitem(last=False)
+    return payload
+
+def build_preview(path):
+    """Stats, email list and the 5-row HTML table for the preview modal."""
+    rows = read_xlsx_rows(path)
+    header = next(rows, ())
+    preview_rows = list(itertools.islice(rows, 5))
+    email_idx = header.index('emails') if 'emails' in header else None
+    
+    # 1. Stats & 2. Extract ALL Valid Emails for the Copy Button
+    # Stream the rest of the sheet, keeping only the 'emails' column
+    total_leads = 0
+    email_cells = []
+    for row in itertools.chain(preview_rows, rows):
+        total_leads += 1
+        if email_idx is not None and email_idx < len(row) and row[email_idx] is not None:
+            email_cells.append(row[email_idx])
+    
+    email_list = unique_emails(email_cells)
+    
+    # 3. Generate Table
+    preview_html = rows_to_html(header, preview_rows)
+    
+    return {
+        "status": "success",
+        "total_leads": total_leads,
+        "total_emails": len(email_list),
+        "email_list": email_list,
+        "html": preview_html
+    }
+
 @app.route("/start_bulk", methods=["POST"])
 def start_bulk():
     data = request.json
@@ -186,7 +265,7 @@ def start_bulk():
     # Reset State for new campaign
     state["queue"] = keywords
     state["cancel"] = False
-    state["logs"] = []
+    state["logs"].clear()
     state["total_progress"] = 0
     state["progress"] = 0
     
@@ -198,8 +277,13 @@ def start_bulk():
 # --- MAIN LOGIC ---
 
 def process_queue(keywords, max_results):
-    all_data = []
     total_keywords = len(keywords)
+    total_leads = 0
+    # Leads are appended here as each keyword finishes (crash-safe partial output)
+    stem = f"Leads_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    jsonl_path = os.path.join(RESULT_FOLDER, f"{stem}.jsonl")
+    # Websites already extracted in this campaign (normalized domain -> site data)
+    site_cache = {}
     
     add_log(f"Starting Campaign: {len(keywords)} locations/niches.")
 
@@ -232,53 +316,46 @@ def process_queue(keywords, max_results):
         enriched_leads = []
         
         if raw_leads:
-            # Use ThreadPool to visit websites concurrently (Faster)
-            with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-                future_to_lead = {executor.submit(enrich_business_data, lead): lead for lead in raw_leads}
-                count = 0
-                for future in concurrent.futures.as_completed(future_to_lead):
-                    if state["cancel"]: break
-                    try:
-                        data = future.result()
-                        enriched_leads.append(data)
-                        count += 1
-                        # Update progress bar for the second half (50% -> 100%)
-                        update_prog(int((count/len(raw_leads))*100), 0.5, offset=50)
-                    except: 
-                        pass
+            # Websites we already visited in this campaign are not fetched again;
+            # each lead keeps its own Maps data and only reuses the site results
+            reused = sum(1 for lead in raw_leads if normalize_website(lead.get('website')) in site_cache)
+            if reused:
+                add_log(f"Reused {reused} already-enriched websites.")
+
+            # One event loop drives all website fetches concurrently (Faster)
+            try:
+                enriched_leads = asyncio.run(enrich_many(
+                    raw_leads,
+                    # Update progress bar for the second half (50% -> 100%)
+                    progress_callback=lambda done, total: update_prog(int((done/total)*100), 0.5, offset=50),
+                    should_cancel=lambda: state["cancel"],
+                    site_cache=site_cache
+                ))
+            except Exception as e:
+                add_log(f"Error enriching leads for '{keyword}': {e}")
         
         # Tag the source keyword
         for lead in enriched_leads:
             lead['keyword_source'] = keyword
-            
-        all_data.extend(enriched_leads)
+        
+        if enriched_leads:
+            # Score this batch and persist it right away
+            scores = score_leads(pd.DataFrame(enriched_leads)).tolist()
+            with open(jsonl_path, "a", encoding="utf-8") as out:
+                for lead, score in zip(enriched_leads, scores):
+                    out.write(json.dumps({**lead, 'lead_score': score}) + "\n")
+            total_leads += len(enriched_leads)
         
         # Update Total Batch Progress
         state["total_progress"] = int(((idx + 1) / total_keywords) * 100)
         add_log(f"Finished {keyword}. Found {len(enriched_leads)} leads.")
 
     # 3. SAVE MASTER REPORT
-    if all_data:
+    if total_leads:
         add_log("Generating Excel Report...")
         try:
-            df = pd.DataFrame(all_data)
-            
-            # Organize columns intelligently (ADDED 'icebreaker' HERE)
-            cols = [
-                'lead_score', 'name', 'best_email', 'icebreaker', 'email_status', 
-                'clean_phone', 'keyword_source', 'emails', 'phone', 
-                'site_title', 'website', 'address'
-            ]
-            # Add any extra columns found
-            final_cols = [c for c in cols if c in df.columns] + [c for c in df.columns if c not in cols]
-            df = df[final_cols]
-            
-            # Sort by Lead Score (Highest quality first)
-            if 'lead_score' in df.columns:
-                df = df.sort_values(by='lead_score', ascending=False)
-            
-            fname = f"Leads_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            df.to_excel(os.path.join(RESULT_FOLDER, fname), index=False)
+            fname = f"{stem}.xlsx"
+            save_leads_xlsx_from_jsonl(jsonl_path, os.path.join(RESULT_FOLDER, fname))
             add_log(f"SUCCESS: Report saved as {fname}")
         except Exception as e:
             add_log(f"Error saving file: {e}")
@@ -289,6 +366,48 @@ def process_queue(keywords, max_results):
     state["progress"] = 100
     state["current_keyword"] = "Done"
 
+# Organize columns intelligently (ADDED 'icebreaker' HERE)
+LEAD_COLUMNS = [
+    'lead_score', 'name', 'best_email', 'icebreaker', 'email_status', 
+    'clean_phone', 'keyword_source', 'emails', 'phone', 
+    'site_title', 'website', 'address'
+]
+
+def save_leads_xlsx_from_jsonl(jsonl_path, xlsx_path):
+    """
+    Converts the campaign JSONL into the master report, sorted by lead score.
+    Only (score, line offset) pairs are held in memory; rows are re-read one
+    at a time and streamed into a write-only workbook.
+    """
+    # Pass 1: sort keys, line offsets and every column that appears
+    index = []
+    seen_cols = {}
+    with open(jsonl_path, "rb") as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                index.append((row.get('lead_score', 0), offset))
+                seen_cols.update(dict.fromkeys(row))
+            offset += len(line)
+
+    # Add any extra columns found
+    cols = [c for c in LEAD_COLUMNS if c in seen_cols] + [c for c in seen_cols if c not in LEAD_COLUMNS]
+
+    # Sort by Lead Score (Highest quality first)
+    index.sort(key=lambda x: x[0], reverse=True)
+
+    # Pass 2: stream rows in score order
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Leads")
+    ws.append(cols)
+    with open(jsonl_path, "rb") as f:
+        for _, offset in index:
+            f.seek(offset)
+            row = json.loads(f.readline())
+            ws.append([row.get(c) for c in cols])
+    wb.save(xlsx_path)
+
 def update_prog(val, scale, offset=0):
     """Updates the progress bar percentage for the UI."""
     state["progress"] = int((val * scale) + offset)
@@ -0,0 +1,196 @@
+import os
+import asyncio
+import multiprocessing
+import threading
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+import aiohttp
+
+from scraper.enricher import (
+    HEADERS, MAX_HTML_BYTES, normalize_website, parse_html_bytes, extract_data_from_html,
+    merge_contact_page, rank_emails, prefetch_mx, apply_site_data
+)
+
+FETCH_TIMEOUT = aiohttp.ClientTimeout(total=8)
+
+# Worker processes for the CPU half (HTML parsing + regex), created on first use.
+# "spawn" because the pool is started from a background thread of the Flask app.
+_PROCESS_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def get_process_pool():
+    global _PROCESS_POOL
+    with _POOL_LOCK:
+        if _PROCESS_POOL is None:
+            _PROCESS_POOL = concurrent.futures.ProcessPoolExecutor(
+                max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn")
+            )
+        return _PROCESS_POOL
+
+def reset_process_pool(pool):
+    """Drops a broken pool so the next get_process_pool() starts fresh workers."""
+    global _PROCESS_POOL
+    with _POOL_LOCK:
+        if _PROCESS_POOL is pool:
+            _PROCESS_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def map_with_pool(func, *iterables):
+    """
+    pool.map with recovery: if a worker died (OOM kill, parser crash) the pool is
+    rebuilt and the batch retried once; after that, parse in this thread instead.
+    """
+    for _ in range(2):
+        pool = get_process_pool()
+        try:
+            return list(pool.map(func, *iterables, chunksize=32))
+        except BrokenProcessPool:
+            reset_process_pool(pool)
+    return list(map(func, *iterables))
+
+async def fetch_html(session, sem, url):
+    """Downloads a page and returns its raw bytes (None on any failure)."""
+    if not url.startswith('http'): url = 'http://' + url
+    try:
+        async with sem:
+            async with session.get(url, timeout=FETCH_TIMEOUT) as resp:
+                if resp.status == 200:
+                    # Stop downloading once we have enough HTML to scan
+                    body = bytearray()
+                    async for chunk in resp.content.iter_chunked(64 * 1024):
+                        body += chunk
+                        if len(body) >= MAX_HTML_BYTES: break
+                    return bytes(body[:MAX_HTML_BYTES])
+    except Exception:
+        return None
+    return None
+
+async def fetch_all(session, sem, urls, progress_callback=None, should_cancel=None):
+    """
+    Stage 1 (I/O): downloads every url concurrently on this event loop.
+    Returns {url: bytes or None}; urls not reached before a cancel are left out.
+    """
+    async def run(url):
+        return url, await fetch_html(session, sem, url)
+
+    pages = {}
+    tasks = [asyncio.ensure_future(run(u)) for u in urls]
+    try:
+        for count, fut in enumerate(asyncio.as_completed(tasks), start=1):
+            if should_cancel and should_cancel(): break
+            url, html = await fut
+            pages[url] = html
+            if progress_callback:
+                progress_callback(count, len(tasks))
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return pages
+
+def parse_page(html, url):
+    """Stage 2 (CPU, runs in a worker process): parse_html_bytes, None on failure."""
+    try:
+        return parse_html_bytes(html, url)
+    except Exception:
+        return None
+
+def extract_page(html):
+    """Stage 2 for contact pages: only emails/socials are needed. None on failure."""
+    try:
+        return extract_data_from_html(html)
+    except Exception:
+        return None
+
+async def map_in_processes(func, *iterables):
+    """pool.map over the worker processes without blocking the event loop."""
+    if not iterables[0]: return []
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, map_with_pool, func, *iterables)
+
+async def fetch_sites(urls, concurrency=64, progress_callback=None, should_cancel=None):
+    """
+    Fetches and extracts every unique website once (keyed by normalized domain):
+    downloads run on the event loop, parsing runs in worker processes.
+    Returns {domain: site or None}; sites not reached before a cancel are left out.
+    """
+    unique = {}
+    for url in urls:
+        key = normalize_website(url)
+        if key: unique.setdefault(key, url)
+
+    sites = {}
+    if not unique: return sites
+
+    sem = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+
+    async with aiohttp.ClientSession(connector=connector, headers=HEADERS) as session:
+        pages = await fetch_all(session, sem, list(unique.values()), progress_callback, should_cancel)
+
+        fetched = [(k, u) for k, u in unique.items() if u in pages]
+        ok = [(k, u) for k, u in fetched if pages[u]]
+        parsed = await map_in_processes(parse_page, [pages[u] for _, u in ok], [u for _, u in ok])
+        for k, _ in fetched: sites[k] = None
+        for (k, _), site in zip(ok, parsed): sites[k] = site
+
+        if should_cancel and should_cancel(): return sites
+
+        # Deep Crawl (Contact Page) if needed
+        contact = {k: s['contact_url'] for k, s in sites.items() if s and s['contact_url']}
+        if contact:
+            c_pages = await fetch_all(session, sem, list(set(contact.values())))
+            c_ok = [(k, c_pages[u]) for k, u in contact.items() if c_pages.get(u)]
+            extracted = await map_in_processes(extract_page, [h for _, h in c_ok])
+            for (k, _), data in zip(c_ok, extracted):
+                if data: merge_contact_page(sites[k], *data)
+
+    return sites
+
+def apply_all(leads, sites):
+    """Fills every lead from already-extracted data (MX answers are prefetched per domain)."""
+    best_emails = []
+    for site in sites.values():
+        ranked = rank_emails(site['emails']) if site else []
+        if ranked: best_emails.append(ranked[0])
+    prefetch_mx(best_emails)
+
+    enriched = []
+    for lead in leads:
+        try:
+            enriched.append(apply_site_data(lead, sites.get(normalize_website(lead.get('website')))))
+        except Exception:
+            pass
+    return enriched
+
+async def enrich_many(leads, concurrency=64, progress_callback=None, should_cancel=None, site_cache=None):
+    """
+    Enriches all leads: every website is fetched once on a single event loop,
+    then the leads are filled in one pass (scoring happens later, see score_leads).
+    site_cache ({domain: site}) carries extracted site data across calls: domains
+    already in it are not fetched again, and new successful fetches are added.
+    progress_callback(done, total) is called after each website; should_cancel() stops early
+    and only the leads whose website was already fetched are returned.
+    Leads that raise are dropped, matching the old thread-pool behaviour.
+    """
+    if not leads: return []
+    if site_cache is None: site_cache = {}
+
+    misses = [lead.get('website') for lead in leads
+              if normalize_website(lead.get('website')) not in site_cache]
+    fetched = await fetch_sites(
+        misses, concurrency=concurrency, progress_callback=progress_callback, should_cancel=should_cancel
+    )
+    # Only real results are reused; failed fetches get another try next time
+    site_cache.update({k: site for k, site in fetched.items() if site})
+    sites = {**fetched, **site_cache}
+
+    if should_cancel and should_cancel():
+        reached = []
+        for lead in leads:
+            key = normalize_website(lead.get('website'))
+            if key is None or key in sites: reached.append(lead)
+        leads = reached
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, apply_all, leads, sites)
@@ -1,33 +1,24 @@
 # scraper/email_scraper.py
-import requests
-from bs4 import BeautifulSoup
 import re
 import csv
 import os
 from urllib.parse import urlparse
 import pandas as pd
 
+from scraper.enricher import fetch_and_extract, rank_emails
+
 EMAIL_RE = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
 
 def extract_emails_from_text(text):
     return list(set(EMAIL_RE.findall(text)))
 
-def scrape_emails_from_website(url, timeout=15):
+def scrape_emails_from_website(url, timeout=15, site_cache=None):
+    # Same fetch-and-scan as the enricher; pass a per-run site_cache to skip repeat domains
     try:
-        if not url.startswith(("http://", "https://")):
-            url = "http://" + url
-        headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 Chrome/116.0.0.0 Safari/537.36"
-            )
-        }
-        resp = requests.get(url, headers=headers, timeout=timeout)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
-        text = soup.get_text(" ", strip=True)
-        emails = extract_emails_from_text(text)
-        return emails
+        site = fetch_and_extract(url, timeout, site_cache)
+        if site is None:
+            return [f"Error: could not fetch {url}"]
+        return rank_emails(site['emails'])
     except Exception as e:
         return [f"Error: {e}"]
 
@@ -106,12 +97,14 @@ def process_csv_scrape_emails(input_csv, output_csv, progress_callback=None):
         raise ValueError("No website/url column found in CSV. Include a 'website' or 'url' column.")
 
     total = len(df)
+    # Sites extracted during this run only (repeat domains are fetched once)
+    site_cache = {}
     for idx, row in df.iterrows():
         raw_url = str(row.get(website_col, "")).strip()
         if not raw_url or raw_url.upper() == "N/A":
             found = []
         else:
-            found = scrape_emails_from_website(raw_url)
+            found = scrape_emails_from_website(raw_url, site_cache=site_cache)
             # Filter out errors
             if isinstance(found, list):
                 found = [e for e in found if not str(e).startswith("Error")]
@@ -1,19 +1,92 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 import re
-from urllib.parse import urljoin
+import functools
+import concurrent.futures
+from urllib.parse import urljoin, urlparse
+from html import unescape
 import dns.resolver
+import pandas as pd
+
+# Prefer the C-backed lxml parser, fall back to the stdlib one if it isn't installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Shared HTTP session (keep-alive + connection pooling across leads)
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
+}
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+)
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
+
+# Created on first lookup (reading resolv.conf can fail, and must not break imports)
+_RESOLVER = None
+
+def _get_resolver():
+    """Shared resolver with short timeouts so a hung nameserver can't stall the workers."""
+    global _RESOLVER
+    if _RESOLVER is None:
+        resolver = dns.resolver.Resolver()
+        resolver.timeout = 2.0
+        resolver.lifetime = 3.0
+        _RESOLVER = resolver
+    return _RESOLVER
+
+# Emails/socials are almost always in the first ~500KB of a page
+MAX_HTML_BYTES = 512_000
 
 # Regex patterns
 EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
-GENERIC_PREFIXES = ['info', 'contact', 'admin', 'support', 'hello', 'office', 'sales', 'enquiries', 'team']
-SOCIAL_PATTERNS = {
-    "facebook": r'facebook\.com\/[a-zA-Z0-9\.]+',
-    "instagram": r'instagram\.com\/[a-zA-Z0-9_\.]+',
-    "linkedin": r'linkedin\.com\/(in|company)\/[a-zA-Z0-9_\-]+',
-    "twitter": r'(twitter\.com|x\.com)\/[a-zA-Z0-9_]+'
+GENERIC_PREFIXES = frozenset(['info', 'contact', 'admin', 'support', 'hello', 'office', 'sales', 'enquiries', 'team'])
+# Substring fallback (e.g. "salesteam", "info.uk") - one compiled scan instead of a Python loop
+GENERIC_RE = re.compile('|'.join(sorted(GENERIC_PREFIXES)))
+
+# Points per signal for score_leads
+SCORE_WEIGHTS = {
+    'phone': 20, 'address': 10, 'email': 40, 'verified': 10,
+    'facebook': 10, 'linkedin': 10
 }
 
+# "Emails" whose TLD is really a file extension (logo@2x.webp, hero@3x.jpeg ...)
+ASSET_EXTENSIONS = frozenset([
+    'png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'bmp', 'ico', 'avif', 'tif', 'tiff',
+    'js', 'css', 'mp4', 'webm', 'woff', 'woff2'
+])
+
+# Entity-encoded "@" (joe&#64;site.com), decoded before the scan like get_text used to
+ENTITY_AT_RE = re.compile(rb'&#0*64;|&#[xX]0*40;|&commat;')
+
+# Start of a link, anchored at the href value so wix.com/... can't pass for x.com/...
+# (any subdomains: www., m., business., en-gb. ...)
+_LINK = rb'(?:https?:)?(?://)?(?:[a-zA-Z0-9-]+\.)*'
+# Rest of the href value, so profile.php?id=..., /p/<name>-<id>, /pages/... stay whole
+_REST = rb'[^"\'\s<>]+'
+
+# One bytes-mode scan over the raw HTML finds emails and social links together.
+# Socials only count inside href values, minus share/pixel/plugin endpoints.
+COMBINED_RE = re.compile(
+    rb'(?P<email>[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})'
+    rb'|href\s*=\s*["\']?(?:'
+    rb'(?P<facebook>' + _LINK + rb'facebook\.com/(?!(?:tr|sharer|share|plugins|dialog|login)\b)' + _REST + rb')'
+    rb'|(?P<instagram>' + _LINK + rb'instagram\.com/(?!(?:p|explore|accounts)\b)' + _REST + rb')'
+    rb'|(?P<linkedin>' + _LINK + rb'linkedin\.com/(?:in|company)/' + _REST + rb')'
+    rb'|(?P<twitter>' + _LINK + rb'(?:twitter|x)\.com/(?!(?:intent|share|home)\b)' + _REST + rb')'
+    rb')'
+)
+SOCIAL_NETWORKS = ("facebook", "instagram", "linkedin", "twitter")
+
 def generate_icebreaker(business):
     """
     Creates a personalized opening line for cold emails based on site data.
@@ -44,15 +117,29 @@ def generate_icebreaker(business):
             
     return f"Hi {name}, I was checking out {clean_title} and noticed {focus}"
 
-def verify_domain_mx(email):
-    """Checks if the email domain actually has mail servers."""
+@functools.lru_cache(maxsize=4096)
+def _mx_lookup(domain):
+    """
+    One DNS query per unique domain for the whole process. Only definitive
+    answers are returned (and cached); timeouts and other resolver errors
+    raise, and lru_cache doesn't cache exceptions, so they're retried next time.
+    """
     try:
-        domain = email.split('@')[-1]
-        records = dns.resolver.resolve(domain, 'MX')
+        records = _get_resolver().resolve(domain, 'MX')
         return True if records else False
-    except:
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
         return False
 
+def _mx_exists(domain):
+    try:
+        return _mx_lookup(domain)
+    except Exception:
+        return False # Transient failure, not cached
+
+def verify_domain_mx(email):
+    """Checks if the email domain actually has mail servers."""
+    return _mx_exists(email.rsplit('@', 1)[-1].lower())
+
 def clean_phone(phone_str):
     """Removes junk characters to make phone ready for dialers."""
     if not phone_str or phone_str == "N/A": return ""
@@ -66,100 +153,174 @@ def sort_emails(email_list):
     generic = []
     for email in email_list:
         prefix = email.split('@')[0].lower()
-        if any(g in prefix for g in GENERIC_PREFIXES):
+        if prefix in GENERIC_PREFIXES or GENERIC_RE.search(prefix):
             generic.append(email)
         else:
             personal.append(email)
     return personal + generic
 
-def get_soup(url):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
-    }
+def normalize_website(url):
+    """Collapses URL variants (scheme, www., path, case) to a bare domain key."""
+    if not url or url.lower() == 'n/a': return None
+    if '://' not in url: url = 'http://' + url
+    netloc = urlparse(url).netloc.lower()
+    if netloc.startswith('www.'): netloc = netloc[4:]
+    return netloc or None
+
+def fetch_html(url, timeout=8):
+    """Downloads a page and returns its raw bytes (None on any failure)."""
     try:
         if not url.startswith('http'): url = 'http://' + url
-        response = requests.get(url, headers=headers, timeout=8)
-        if response.status_code == 200:
-            return BeautifulSoup(response.text, 'html.parser')
+        with SESSION.get(url, headers=HEADERS, timeout=timeout, stream=True) as response:
+            if response.status_code == 200:
+                return response.raw.read(MAX_HTML_BYTES, decode_content=True)
     except:
         return None
     return None
 
-def extract_data_from_soup(soup):
-    text = soup.get_text(" ")
-    emails = set(EMAIL_RE.findall(text))
-    
-    socials = {k: [] for k in SOCIAL_PATTERNS}
-    for a in soup.find_all('a', href=True):
-        href = a['href']
-        for network, pattern in SOCIAL_PATTERNS.items():
-            if re.search(pattern, href):
-                socials[network].append(href)
+def extract_data_from_html(html):
+    """
+    Pulls emails and social profile links out of raw HTML bytes in a single pass.
+    Social links keep the full href value:
+
+    >>> page = (b'<a href="https://www.facebook.com/profile.php?id=100063&amp;ref=x">f</a>'
+    ...         b'<a href="https://business.facebook.com/p/Acme-Plumbing-1000123">p</a>'
+    ...         b'<a href="https://www.facebook.com/sharer/sharer.php?u=x">s</a>'
+    ...         b'<img src="https://www.facebook.com/tr?id=1&ev=PageView">'
+    ...         b'<a href="https://en-gb.facebook.com/pages/Acme/123">g</a>'
+    ...         b'<a href="https://uk.linkedin.com/company/acme-ltd/">l</a>'
+    ...         b'<a href="https://wix.com/site">w</a><img src="/logo@2x.webp">'
+    ...         b'<p>joe&#64;acmeplumbing.com</p>')
+    >>> emails, socials = extract_data_from_html(page)
+    >>> sorted(emails)
+    ['joe@acmeplumbing.com']
+    >>> sorted(socials['facebook'])  # doctest: +NORMALIZE_WHITESPACE
+    ['https://business.facebook.com/p/Acme-Plumbing-1000123',
+     'https://en-gb.facebook.com/pages/Acme/123',
+     'https://www.facebook.com/profile.php?id=100063&ref=x']
+    >>> socials['linkedin'], socials['twitter']
+    (['https://uk.linkedin.com/company/acme-ltd/'], [])
+    """
+    emails = set()
+    socials = {k: set() for k in SOCIAL_NETWORKS}
+    html = ENTITY_AT_RE.sub(b'@', html)
+    for m in COMBINED_RE.finditer(html):
+        value = m.group(m.lastgroup).decode('utf-8', 'ignore')
+        if m.lastgroup == 'email':
+            if value.rsplit('.', 1)[-1].lower() not in ASSET_EXTENSIONS:
+                emails.add(value)
+        else:
+            socials[m.lastgroup].add(unescape(value)) # &amp; inside href values
     
     # Clean up socials
-    for k in socials: socials[k] = list(set(socials[k]))
-    return emails, socials
+    return emails, {k: list(v) for k, v in socials.items()}
 
-def enrich_business_data(business):
-    url = business.get('website')
-    
+def find_contact_link(soup, url):
+    """Returns the absolute URL of the first 'contact' link on the page, if any."""
+    for link in soup.find_all('a', href=True):
+        if 'contact' in link['href'].lower():
+            return urljoin(url, link['href'])
+    return None
+
+def parse_html_bytes(html, url=None):
+    """
+    CPU-only half of the enrichment: everything we need from one page.
+    Returns {'emails', 'socials', 'title', 'desc', 'contact_url'}; contact_url is
+    only looked up when the page had no emails (and a base url was given).
+    """
+    soup = BeautifulSoup(html, HTML_PARSER)
+    site = {'title': "", 'desc': "", 'contact_url': None}
+
+    # Get Context (Title/Desc)
+    try:
+        if soup.title: site['title'] = soup.title.string.strip()
+        meta = soup.find('meta', attrs={'name': 'description'})
+        if meta: site['desc'] = meta.get('content', '').strip()
+    except: pass
+
+    # Extract Emails & Socials
+    site['emails'], site['socials'] = extract_data_from_html(html)
+
+    if not site['emails'] and url:
+        site['contact_url'] = find_contact_link(soup, url)
+    return site
+
+def merge_contact_page(site, emails, socials):
+    """Adds the emails/socials found on the contact page to the site data."""
+    site['emails'].update(emails)
+    for k, v in socials.items():
+        site['socials'][k] = list(set(site['socials'][k]) | set(v))
+    return site
+
+def fetch_and_extract(url, timeout=8, site_cache=None):
+    """
+    One fetch-and-scan per website (plus the contact page when the homepage has
+    no emails). None if the site could not be fetched.
+    site_cache is an optional per-run {normalized domain: site} memo owned by the
+    caller; failures are never stored, so they are retried on the next call.
+    """
+    key = normalize_website(url)
+    if site_cache is not None and key in site_cache:
+        return site_cache[key]
+
+    html = fetch_html(url, timeout)
+    if not html: return None
+    site = parse_html_bytes(html, url)
+
+    # Deep Crawl (Contact Page) if needed
+    if site['contact_url']:
+        c_html = fetch_html(site['contact_url'], timeout)
+        if c_html: merge_contact_page(site, *extract_data_from_html(c_html))
+
+    if site_cache is not None and key: site_cache[key] = site
+    return site
+
+def rank_emails(emails):
+    """Drops asset filenames that look like emails and puts personal addresses first."""
+    valid_emails = [e for e in emails if e.rsplit('.', 1)[-1].lower() not in ASSET_EXTENSIONS]
+    return sort_emails(valid_emails)
+
+def prefetch_mx(emails, max_workers=16):
+    """Resolves MX for every unique domain up front so the per-lead checks hit the cache."""
+    domains = {e.rsplit('@', 1)[-1].lower() for e in emails}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(_mx_exists, domains))
+
+def prepare_business(business):
+    """Initializes the enrichment fields (lead_score is computed later by score_leads)."""
     # Initialize fields including new 'icebreaker'
     business.update({
         'emails': "", 'best_email': "", 'email_status': "N/A", 
         'site_title': "", 'site_desc': "", 'icebreaker': "",
         'facebook': "", 'instagram': "", 'linkedin': "", 
-        'lead_score': 0, 'clean_phone': clean_phone(business.get('phone', ''))
+        'clean_phone': clean_phone(business.get('phone', ''))
     })
-    
-    # 1. Base Score from Maps Data
-    score = 0
-    if business.get('phone') and business.get('phone') != "N/A": score += 20
-    if business.get('address') and business.get('address') != "N/A": score += 10
-    
-    if not url or url.lower() == 'n/a': 
-        business['lead_score'] = score
-        return business
+    return business
 
-    soup = get_soup(url)
-    if not soup: 
-        business['lead_score'] = score
+def apply_site_data(business, site):
+    """
+    Fills every enrichment field from already-extracted site data (or None).
+    No network besides the cached MX check.
+    """
+    prepare_business(business)
+    if not site:
         return business
 
-    # 2. Get Context (Title/Desc)
-    try:
-        if soup.title: business['site_title'] = soup.title.string.strip()
-        meta = soup.find('meta', attrs={'name': 'description'})
-        if meta: business['site_desc'] = meta.get('content', '').strip()
-    except: pass
-
-    # 3. Extract Emails & Socials
-    emails, socials = extract_data_from_soup(soup)
-
-    # Deep Crawl (Contact Page) if needed
-    if not emails:
-        for link in soup.find_all('a', href=True):
-            if 'contact' in link['href'].lower():
-                full_link = urljoin(url, link['href'])
-                c_soup = get_soup(full_link)
-                if c_soup:
-                    e, s = extract_data_from_soup(c_soup)
-                    emails.update(e)
-                    for k, v in s.items(): socials[k].extend(v)
-                break
+    # 2. Context (Title/Desc)
+    business['site_title'] = site['title']
+    business['site_desc'] = site['desc']
 
     # 4. Process Emails
-    valid_emails = [e for e in emails if e.split('.')[-1] not in ['png','jpg','js','css']]
-    sorted_emails = sort_emails(valid_emails)
+    sorted_emails = rank_emails(site['emails'])
+    socials = site['socials']
     
     business['emails'] = ", ".join(sorted_emails)
     if sorted_emails:
         business['best_email'] = sorted_emails[0] # The one they should email first
-        score += 40 # Huge points for finding an email
         
         # Domain Check
         if verify_domain_mx(sorted_emails[0]):
             business['email_status'] = "Verified"
-            score += 10
         else:
             business['email_status'] = "Unverified"
 
@@ -168,12 +329,39 @@ def enrich_business_data(business):
     business['instagram'] = ", ".join(socials['instagram'])
     business['linkedin'] = ", ".join(socials['linkedin'])
     
-    if business['facebook']: score += 10
-    if business['linkedin']: score += 10
-    
     # 6. Generate Icebreaker (New Feature)
     business['icebreaker'] = generate_icebreaker(business)
     
-    business['lead_score'] = min(score, 100) # Cap at 100
-    
-    return business
\ No newline at end of file
+    return business
+
+def score_leads(df):
+    """
+    Vectorized lead score over the whole report (0-100, highest quality first).
+    Weights live in SCORE_WEIGHTS so they can be tuned without touching enrichment.
+    """
+    def column(name):
+        if name not in df.columns: return pd.Series('', index=df.index)
+        return df[name].fillna('').astype(str)
+
+    def has(name, missing=''):
+        # True where the column holds a real value (not blank / missing marker)
+        values = column(name)
+        return values.ne('') & values.ne(missing)
+
+    w = SCORE_WEIGHTS
+    score = (
+        has('phone', 'N/A').mul(w['phone'])            # Base Score from Maps Data
+        + has('address', 'N/A').mul(w['address'])
+        + has('best_email').mul(w['email'])            # Huge points for finding an email
+        + column('email_status').eq('Verified').mul(w['verified'])
+        + has('facebook').mul(w['facebook'])
+        + has('linkedin').mul(w['linkedin'])
+    )
+    return score.clip(upper=100).astype('int16') # Cap at 100
+
+def enrich_business_data(business, site_cache=None):
+    url = business.get('website')
+    site = None
+    if url and url.lower() != 'n/a':
+        site = fetch_and_extract(url, site_cache=site_cache)
+    return apply_site_data(business, site)
@@ -1,7 +1,80 @@
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+import re
 import time
 import random
 
+# Resources the scraper never looks at. Stylesheets stay: the results feed
+# only scrolls (and lazy-loads more cards) with Maps' CSS applied.
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+BLOCKED_URL_PARTS = ("google-analytics.com", "googletagmanager.com", "doubleclick.net", "/gen_204", "/log?")
+
+def block_unneeded(route):
+    """Aborts image/font/media and telemetry requests, lets the rest through."""
+    req = route.request
+    if req.resource_type in BLOCKED_RESOURCE_TYPES or any(p in req.url for p in BLOCKED_URL_PARTS):
+        route.abort()
+    else:
+        route.continue_()
+
+# Reads every detail-pane field in one browser round-trip
+DETAILS_JS = """() => {
+    const q = s => document.querySelector(s);
+    return {
+        name: q('h1.DUwDvf')?.innerText,
+        rating: q('div.F7nice span span')?.innerText,
+        address: q('button[data-item-id*="address"]')?.getAttribute('aria-label'),
+        phone: q('button[data-item-id*="phone"]')?.getAttribute('aria-label'),
+        website: q('a[data-item-id*="authority"]')?.getAttribute('href'),
+    };
+}"""
+
+# Harvests every result card in the feed in one round-trip
+CARDS_JS = """() => [...document.querySelectorAll('div.Nv2PK')].map(el => {
+    // First innermost info row is "Category · Address"; hand back the second slot
+    const rows = [...el.querySelectorAll('.W4Efsd')].filter(r => !r.querySelector('.W4Efsd'));
+    const slots = rows.length ? rows[0].innerText.split('·').map(t => t.trim()) : [];
+    return {
+        name: el.querySelector('.qBF1Pd')?.innerText,
+        rating: el.querySelector('.MW4etd')?.innerText,
+        website: el.querySelector('a[data-value="Website"]')?.href,
+        phone: el.querySelector('.UsdlK')?.innerText,
+        address: slots[1],
+    };
+})"""
+
+# A card's address slot is only trusted when it looks like a street address
+# (house number plus a street word, or a postcode); otherwise the card is clicked.
+STREET_RE = re.compile(
+    r"\d+\w*\s+(?:[\w.'-]+\s+)*(?:st|street|rd|road|ave|avenue|blvd|boulevard|ln|lane|dr|drive|way|"
+    r"ct|court|pl|place|sq|square|ter|terrace|hwy|highway|pkwy|parkway|cres|crescent|close|row|"
+    r"marg|nagar)\b\.?"
+    r"|\b[A-Z]{1,2}\d[A-Z\d]?\s*\d[A-Z]{2}\b"  # UK postcode
+    r"|\b[A-Z]{2}\s+\d{5}(?:-\d{4})?\b",       # US state + ZIP
+    re.IGNORECASE
+)
+
+def card_address(text):
+    """Address from a result card, or "N/A" when the slot doesn't look like one."""
+    text = (text or "").strip()
+    return text if text and STREET_RE.search(text) else "N/A"
+
+# True once the detail pane shows a listing other than the previous one
+PANE_CHANGED_JS = """(prev) => {
+    const h = document.querySelector('h1.DUwDvf');
+    return h && h.innerText && h.innerText !== prev;
+}"""
+
+# True once the feed holds more cards than before the scroll
+MORE_RESULTS_JS = "(prev) => document.querySelectorAll('div.Nv2PK').length > prev"
+
+def wait_for_more_results(page, count, timeout=3000):
+    """Waits until more than `count` result cards are rendered. False on timeout."""
+    try:
+        page.wait_for_function(MORE_RESULTS_JS, arg=count, timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
 def scrape_google_maps(query, max_results=10, headless=True, progress_callback=None):
     results = []
     
@@ -14,6 +87,7 @@ def scrape_google_maps(query, max_results=10, headless=True, progress_callback=N
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         )
         page = context.new_page()
+        page.route("**/*", block_unneeded)
         
         try:
             print(f"--- Opening Google Maps for: {query} ---")
@@ -78,9 +152,9 @@ def scrape_google_maps(query, max_results=10, headless=True, progress_callback=N
             # 6. Scroll and Scrape
             feed = page.locator('div[role="feed"]')
             
-            # Scroll loop
+            # Scroll loop (advance as soon as new cards render instead of sleeping)
+            listings = page.locator('div.Nv2PK')
             while True:
-                listings = page.locator('div.Nv2PK')
                 count = listings.count()
                 
                 if count >= max_results:
@@ -88,60 +162,59 @@ def scrape_google_maps(query, max_results=10, headless=True, progress_callback=N
                 
                 # Scroll the feed
                 feed.evaluate("el => el.scrollBy(0, el.scrollHeight)")
-                time.sleep(2) # Give time for gray boxes to load content
+                if wait_for_more_results(page, count):
+                    continue
                 
                 # Check if end of list
                 if page.locator("text=You've reached the end of the list").is_visible():
                     break
                 
-                # Safety break if no new items load for a long time
-                if count == listings.count() and count > 0:
-                    # try forcing a small scroll up and down
-                    feed.evaluate("el => el.scrollBy(0, -100)")
-                    time.sleep(0.5)
-                    feed.evaluate("el => el.scrollBy(0, 500)")
-                    time.sleep(2)
-                    if count == listings.count():
-                        break
+                # Nothing new yet: try forcing a small scroll up and down once more
+                feed.evaluate("el => el.scrollBy(0, -100)")
+                feed.evaluate("el => el.scrollBy(0, 500)")
+                if not wait_for_more_results(page, count):
+                    break
 
-            # 7. Extract Data
+            # 7. Extract Data (cards first, detail pane only when a card is incomplete)
             listings = page.locator('div.Nv2PK')
-            final_count = min(listings.count(), max_results)
+            cards = page.evaluate(CARDS_JS)[:max_results]
+            final_count = len(cards)
             print(f"Processing {final_count} results...")
 
-            for i in range(final_count):
+            last_name = None
+            for i, card in enumerate(cards):
                 if progress_callback:
                     progress_callback(int((i / final_count) * 100))
                 
                 try:
-                    # Click to load details
-                    listings.nth(i).click()
-                    time.sleep(1) 
-
-                    details = {'name': "N/A", 'phone': "N/A", 'website': "N/A", 'address': "N/A", 'rating': "N/A"}
-                    
-                    # Name (Try h1)
-                    if page.locator("h1.DUwDvf").count() > 0:
-                        details['name'] = page.locator("h1.DUwDvf").first.inner_text()
-                    
-                    # Rating
-                    if page.locator("div.F7nice span span").count() > 0:
-                        details['rating'] = page.locator("div.F7nice span span").first.inner_text()
-
-                    # Address & Phone (via Aria Labels)
-                    # We look for buttons that start with "Address:" or "Phone:"
-                    # The localized version might be different, so we check generic data-item-ids too
-                    
-                    if page.locator('button[data-item-id*="address"]').count() > 0:
-                        txt = page.locator('button[data-item-id*="address"]').get_attribute("aria-label") or ""
-                        details['address'] = txt.replace("Address: ", "").strip()
-                        
-                    if page.locator('button[data-item-id*="phone"]').count() > 0:
-                        txt = page.locator('button[data-item-id*="phone"]').get_attribute("aria-label") or ""
-                        details['phone'] = txt.replace("Phone: ", "").strip()
-                        
-                    if page.locator('a[data-item-id*="authority"]').count() > 0:
-                        details['website'] = page.locator('a[data-item-id*="authority"]').get_attribute("href") or "N/A"
+                    details = {
+                        'name': card.get('name') or "N/A",
+                        'phone': (card.get('phone') or "").strip() or "N/A",
+                        'website': card.get('website') or "N/A",
+                        'address': card_address(card.get('address')),
+                        'rating': card.get('rating') or "N/A"
+                    }
+
+                    # Missing address also counts (it feeds the lead score)
+                    if "N/A" in (details['website'], details['phone'], details['address']):
+                        # Click to load details, then wait for the pane to switch to this listing
+                        listings.nth(i).click()
+                        try:
+                            page.wait_for_function(PANE_CHANGED_JS, arg=last_name, timeout=3000)
+                        except PlaywrightTimeoutError:
+                            pass # Read whatever is on screen
+
+                        raw = page.evaluate(DETAILS_JS)
+                        last_name = raw.get('name')
+                        # Detail pane wins, card values fill any gaps
+                        pane = {
+                            'name': raw.get('name'),
+                            'phone': (raw.get('phone') or "").replace("Phone: ", "").strip(),
+                            'website': raw.get('website'),
+                            'address': (raw.get('address') or "").replace("Address: ", "").strip(),
+                            'rating': raw.get('rating')
+                        }
+                        details.update({k: v for k, v in pane.items() if v})
 
                     print(f"Found: {details['name']}")
                     results.append(details)